@@ -0,0 +1,361 @@
+# alerts.py
+"""
+Alert dispatching for MediaMTX Monitor application.
+Delivers trigger and restart events to webhook, syslog and file sinks from
+background threads with batching, per-sink coalescing and retries.
+"""
+
+import json
+import queue
+import socket
+import threading
+import time
+import requests
+from datetime import datetime
+from config import (
+    ALERT_QUEUE_SIZE, ALERT_BATCH_INTERVAL, ALERT_MAX_BATCH_DELAY, ALERT_MAX_BATCH_SIZE,
+    ALERT_SINK_QUEUE_SIZE, ALERT_MAX_RETRIES, ALERT_RETRY_BACKOFF, ALERT_MAX_LISTED_CONNECTIONS,
+    ALERT_EVENT_TYPES, CHECK_STARTED_EVENT, CHECK_COMPLETED_EVENT
+)
+from utils import load_settings, add_debug_log, subscribe_events
+
+# Global dispatcher variables
+alert_queue = queue.Queue(maxsize=ALERT_QUEUE_SIZE)  # Bounded queue between publishers and dispatcher
+dispatcher_thread = None
+dispatcher_active = False
+alert_sinks = []  # Validated sinks from settings
+alert_event_filter = frozenset()  # Trigger types delivered to at least one enabled sink
+reported_drops = {}  # Sink key -> dropped count already delivered to that sink
+sink_workers = {}  # Sink key -> SinkWorker delivering to that sink
+check_in_progress = False  # A monitor check is running, keep the batch open
+alert_stats = {
+    "published": 0,  # Events accepted into the queue
+    "dropped": 0,  # Events dropped because the queue was full
+    "batches": 0,  # Batches dispatched
+    "delivered": 0,  # Successful sink deliveries
+    "failed": 0,  # Sink deliveries that failed after all retries
+    "retries": 0,  # Retry attempts
+    "last_error": None
+}
+
+def enqueue_alert_event(event):
+    """Queue event for dispatching, never blocks the caller"""
+    # Events no sink would receive must not take queue capacity
+    if not dispatcher_active or not alert_event_filter:
+        return
+    trigger_type = event.get("trigger_type")
+    if trigger_type not in alert_event_filter and trigger_type not in (CHECK_STARTED_EVENT, CHECK_COMPLETED_EVENT):
+        return
+    try:
+        alert_queue.put_nowait(event)
+        alert_stats["published"] += 1
+    except queue.Full:
+        alert_stats["dropped"] += 1
+
+def collect_batch():
+    """
+    Wait for events and collect them into a batch.
+
+    While a monitor check is running the batch stays open until the check
+    completes, so all kicks of one check end up in one message however slow
+    they are. Outside checks the batch is sent once no new event arrived for
+    ALERT_BATCH_INTERVAL. No batch is held longer than ALERT_MAX_BATCH_DELAY.
+    """
+    global check_in_progress
+    batch = []
+    opened = None
+    quiet_deadline = None
+    while dispatcher_active and len(batch) < ALERT_MAX_BATCH_SIZE:
+        if opened is None:
+            timeout = 1  # Return regularly so the worker can reload settings
+        else:
+            deadline = opened + ALERT_MAX_BATCH_DELAY
+            if not check_in_progress:
+                deadline = min(deadline, quiet_deadline)
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+        try:
+            event = alert_queue.get(timeout=timeout)
+        except queue.Empty:
+            break
+
+        trigger_type = event.get("trigger_type")
+        if trigger_type == CHECK_STARTED_EVENT:
+            check_in_progress = True
+        elif trigger_type == CHECK_COMPLETED_EVENT:
+            check_in_progress = False
+            if batch:
+                break
+        else:
+            batch.append(event)
+            now = time.monotonic()
+            if opened is None:
+                opened = now
+            quiet_deadline = now + ALERT_BATCH_INTERVAL
+    return batch
+
+def coalesce_events(events):
+    """Coalesce events into one group per trigger type and action"""
+    groups = {}
+    for event in events:
+        key = (event.get("trigger_type"), event.get("action"))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "trigger_type": key[0],
+                "action": key[1],
+                "count": 0,
+                "connections": [],
+                "paths": [],
+                "first_seen": event.get("timestamp"),
+                "last_seen": event.get("timestamp")
+            }
+        group["count"] += 1
+        group["last_seen"] = event.get("timestamp")
+        if event.get("connection_id") not in group["connections"]:
+            group["connections"].append(event.get("connection_id"))
+        if event.get("path") not in group["paths"]:
+            group["paths"].append(event.get("path"))
+    return list(groups.values())
+
+def format_alert_summary(groups):
+    """Format coalesced groups as a single human readable line"""
+    parts = []
+    for group in groups:
+        connections = group["connections"]
+        listed = ", ".join(str(c) for c in connections[:ALERT_MAX_LISTED_CONNECTIONS])
+        if len(connections) > ALERT_MAX_LISTED_CONNECTIONS:
+            listed += f" (+{len(connections) - ALERT_MAX_LISTED_CONNECTIONS} more)"
+        parts.append(f"{group['trigger_type']}/{group['action']} x{group['count']} on {len(connections)} connection(s): {listed}")
+    return "; ".join(parts)
+
+def build_alert_message(events, dropped):
+    """Build the message delivered to a sink for a batch of events"""
+    groups = coalesce_events(events)
+    return {
+        "source": "mediamtx_monitor",
+        "sent_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "event_count": len(events),
+        "dropped_events": dropped,
+        "summary": format_alert_summary(groups),
+        "groups": groups
+    }
+
+def send_webhook(sink, message):
+    """Deliver message to webhook sink"""
+    response = requests.post(sink["url"], json=message, timeout=sink.get("timeout", 5))
+    response.raise_for_status()
+
+def parse_syslog_address(address):
+    """Parse syslog "host[:port]" address, port defaults to 514"""
+    host, separator, port = str(address).rpartition(":")
+    if not separator:
+        return str(address) or "localhost", 514
+    port = int(port)
+    if not 0 < port < 65536:
+        raise ValueError(f"invalid port {port}")
+    return host or "localhost", port
+
+def send_syslog(sink, message):
+    """Deliver message to syslog sink over UDP"""
+    host, port = parse_syslog_address(sink.get("address", "localhost"))
+    facility = sink.get("facility", 1)  # user-level messages
+    severity = 4  # warning
+    line = f"<{facility * 8 + severity}>mediamtx_monitor: {message['summary']}"
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(line.encode("utf-8"), (host, port))
+
+def send_file(sink, message):
+    """Deliver message to file sink as a JSON line"""
+    with open(sink["path"], "a") as f:
+        f.write(json.dumps(message) + "\n")
+
+SINK_HANDLERS = {
+    "webhook": send_webhook,
+    "syslog": send_syslog,
+    "file": send_file
+}
+
+def validate_alert_sink(sink):
+    """Get list of problems with an alert sink configuration"""
+    if not isinstance(sink, dict):
+        return ["sink must be an object"]
+    sink_type = sink.get("type")
+    if sink_type not in SINK_HANDLERS:
+        return [f"unknown sink type: {sink_type}"]
+    errors = []
+    if sink_type == "webhook" and not sink.get("url"):
+        errors.append("webhook sink requires \"url\"")
+    if sink_type == "file" and not sink.get("path"):
+        errors.append("file sink requires \"path\"")
+    if sink_type == "syslog":
+        try:
+            parse_syslog_address(sink.get("address", "localhost"))
+        except ValueError as e:
+            errors.append(f"invalid syslog address {sink.get('address')!r}: {e}")
+        if not isinstance(sink.get("facility", 1), int):
+            errors.append("syslog \"facility\" must be an integer")
+    if not isinstance(sink.get("events", []), list):
+        errors.append("\"events\" must be a list of trigger types")
+    return errors
+
+def validate_alert_sinks(sinks):
+    """Get list of problems with the alert_sinks setting"""
+    if not isinstance(sinks, list):
+        return ["alert_sinks must be a list"]
+    errors = []
+    for index, sink in enumerate(sinks):
+        errors.extend(f"alert_sinks[{index}]: {error}" for error in validate_alert_sink(sink))
+    return errors
+
+def configure_alerts(settings):
+    """Apply alert sink settings, skipping invalid sinks"""
+    global alert_sinks, alert_event_filter
+    sinks = settings.get("alert_sinks") or []
+    if not isinstance(sinks, list):
+        sinks = []
+    valid_sinks = []
+    for sink in sinks:
+        errors = validate_alert_sink(sink)
+        if errors:
+            add_debug_log("Ignoring invalid alert sink: %s", "WARNING", "; ".join(errors), key="invalid_alert_sink")
+        elif sink.get("enabled", True):
+            valid_sinks.append(sink)
+    event_types = set()
+    for sink in valid_sinks:
+        event_types.update(sink.get("events", ALERT_EVENT_TYPES))
+    alert_sinks = valid_sinks
+    alert_event_filter = frozenset(event_types)
+
+    # Stop workers of sinks that were removed or changed
+    current_keys = {get_sink_key(sink) for sink in valid_sinks}
+    for key in [key for key in sink_workers if key not in current_keys]:
+        sink_workers.pop(key).stop()
+
+def get_sink_key(sink):
+    """Get stable identity of a sink for drop accounting"""
+    return json.dumps(sink, sort_keys=True)
+
+class SinkWorker:
+    """Delivery thread for one sink, so a slow or dead sink never delays the others"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.key = get_sink_key(sink)
+        self.handler = SINK_HANDLERS[sink["type"]]
+        self.queue = queue.Queue(maxsize=ALERT_SINK_QUEUE_SIZE)
+        self.active = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, events):
+        """Queue events for delivery, never blocks the dispatcher"""
+        try:
+            self.queue.put_nowait(events)
+        except queue.Full:
+            alert_stats["dropped"] += len(events)
+
+    def stop(self):
+        """Stop the worker after the message in progress"""
+        self.active = False
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def run(self):
+        """Deliver queued batches until stopped"""
+        while self.active:
+            events = self.queue.get()
+            try:
+                if events is not None:
+                    self.deliver(events)
+            except Exception as e:
+                add_debug_log("Error in %s alert sink worker: %s", "ERROR", self.sink["type"], e)
+            finally:
+                self.queue.task_done()
+
+    def deliver(self, events):
+        """Deliver one coalesced message, retrying with exponential backoff"""
+        # Report events dropped since the last message this sink received
+        dropped_total = alert_stats["dropped"]
+        message = build_alert_message(events, dropped_total - reported_drops.get(self.key, 0))
+
+        delay = ALERT_RETRY_BACKOFF
+        for attempt in range(1, ALERT_MAX_RETRIES + 1):
+            try:
+                self.handler(self.sink, message)
+                alert_stats["delivered"] += 1
+                reported_drops[self.key] = dropped_total
+                return True
+            except Exception as e:
+                alert_stats["last_error"] = f"{self.sink['type']}: {e}"
+                if attempt == ALERT_MAX_RETRIES or not self.active:
+                    break
+                alert_stats["retries"] += 1
+                time.sleep(delay)
+                delay *= 2
+
+        alert_stats["failed"] += 1
+        add_debug_log("Failed to deliver alert to %s sink: %s", "ERROR", self.sink["type"], alert_stats["last_error"],
+                      key=("alert_delivery_failed", self.key))
+        return False
+
+def dispatch_batch(events):
+    """Hand a batch of events to the worker of each configured sink"""
+    alert_stats["batches"] += 1
+    for sink in alert_sinks:
+        event_types = sink.get("events", ALERT_EVENT_TYPES)
+        sink_events = [e for e in events if e.get("trigger_type") in event_types]
+        if not sink_events:
+            continue
+        key = get_sink_key(sink)
+        worker = sink_workers.get(key)
+        if worker is None:
+            worker = sink_workers[key] = SinkWorker(sink)
+        worker.submit(sink_events)
+
+def wait_for_sinks():
+    """Block until every sink worker has handled its queued messages"""
+    for worker in list(sink_workers.values()):
+        worker.queue.join()
+
+def alert_dispatcher_worker():
+    """Background worker for alert dispatching"""
+    add_debug_log("Alert dispatcher started", "INFO")
+    while dispatcher_active:
+        try:
+            configure_alerts(load_settings())
+            batch = collect_batch()
+            if batch:
+                dispatch_batch(batch)
+        except Exception as e:
+            add_debug_log("Error in alert dispatcher: %s", "ERROR", e, key="alert_dispatcher_error")
+            time.sleep(1)
+    add_debug_log("Alert dispatcher stopped", "INFO")
+
+def start_alert_dispatcher():
+    """Start alert dispatcher"""
+    global dispatcher_thread, dispatcher_active
+    if not dispatcher_active:
+        dispatcher_active = True
+        configure_alerts(load_settings())
+        subscribe_events(enqueue_alert_event)
+        dispatcher_thread = threading.Thread(target=alert_dispatcher_worker, daemon=True)
+        dispatcher_thread.start()
+
+def stop_alert_dispatcher():
+    """Stop alert dispatcher"""
+    global dispatcher_active
+    dispatcher_active = False
+    for key in list(sink_workers):
+        sink_workers.pop(key).stop()
+
+def get_alert_status():
+    """Get current alert dispatcher status"""
+    status = dict(alert_stats)
+    status["active"] = dispatcher_active
+    status["queued"] = alert_queue.qsize()
+    status["queue_size"] = ALERT_QUEUE_SIZE
+    return status
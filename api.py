@@ -4,6 +4,7 @@ API routes and endpoints for MediaMTX Monitor application.
 Handles all /api/* routes and data processing for the web interface.
 """
 
+import time
 import requests
 from flask import Blueprint, jsonify, request
 from config import API_BASE_URL, MTX_API_ENDPOINTS, API_HOST, DEFAULT_PORTS
@@ -11,8 +12,9 @@ from monitoring import (
     connection_history, start_monitoring, stop_monitoring, 
     get_monitoring_status, restart_srt_connection, clear_connection_history
 )
+from alerts import get_alert_status, validate_alert_sinks, configure_alerts
 from utils import (
-    debug_log, trigger_history, load_settings, save_settings,
+    trigger_history, load_settings, save_settings, get_debug_log_entries, configure_logging,
     clear_debug_log, clear_trigger_history, add_debug_log, add_trigger_event
 )
 
@@ -116,7 +118,16 @@ def save_auto_restart_settings():
     """Save auto-restart settings"""
     try:
         settings = request.get_json()
+        # Alert sinks are not part of the settings form, keep the stored ones
+        if "alert_sinks" not in settings:
+            settings["alert_sinks"] = load_settings().get("alert_sinks", [])
+        else:
+            errors = validate_alert_sinks(settings["alert_sinks"])
+            if errors:
+                return jsonify({"error": "Invalid alert sinks: " + "; ".join(errors)}), 400
         if save_settings(settings):
+            configure_logging(settings)
+            configure_alerts(settings)
             return jsonify({"success": True})
         else:
             return jsonify({"error": "Failed to save settings"}), 500
@@ -149,11 +160,19 @@ def stop_monitoring_api():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@api_bp.route('/alert_status', methods=['GET'])
+def api_alert_status():
+    """Get alert dispatcher status"""
+    try:
+        return jsonify(get_alert_status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @api_bp.route('/connection_history', methods=['GET'])
 def get_connection_history():
     """Get connection history for diagnostics"""
     try:
-        return jsonify(connection_history)
+        return jsonify(connection_history.snapshot())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -208,7 +227,8 @@ def restart_all_problematic_connections():
         problematic_connections = []
         for conn in data["items"]:
             conn_id = conn.get("id")
-            if conn_id and conn_id in connection_history and connection_history[conn_id]["failure_count"] > 0:
+            conn_history = connection_history.get(conn_id) if conn_id else None
+            if conn_history and conn_history.failure_count > 0:
                 problematic_connections.append(conn)
         
         if not problematic_connections:
@@ -217,7 +237,7 @@ def restart_all_problematic_connections():
         success_count = 0
         fail_count = 0
         
-        add_debug_log(f"Starting bulk restart of {len(problematic_connections)} problematic connections", "INFO")
+        add_debug_log("Starting bulk restart of %d problematic connections", "INFO", len(problematic_connections))
         
         for conn in problematic_connections:
             conn_id = conn.get("id")
@@ -226,15 +246,16 @@ def restart_all_problematic_connections():
             if restart_srt_connection(conn_id, path):
                 success_count += 1
                 # Reset counter after successful restart
-                if conn_id in connection_history:
-                    connection_history[conn_id]["failure_count"] = 0
-                    connection_history[conn_id]["last_restart"] = datetime.now()
+                conn_history = connection_history.get(conn_id)
+                if conn_history is not None:
+                    conn_history.failure_count = 0
+                    conn_history.last_restart = time.monotonic()
                 add_trigger_event(conn_id, path, "bulk_restart", 0, 0, "success")
             else:
                 fail_count += 1
                 add_trigger_event(conn_id, path, "bulk_restart", 0, 0, "failure")
         
-        add_debug_log(f"Bulk restart completed: {success_count} successful, {fail_count} failed", "INFO")
+        add_debug_log("Bulk restart completed: %d successful, %d failed", "INFO", success_count, fail_count)
         
         return jsonify({
             "success": True,
@@ -244,7 +265,7 @@ def restart_all_problematic_connections():
         })
         
     except Exception as e:
-        add_debug_log(f"Error restarting all problematic connections: {e}", "ERROR")
+        add_debug_log("Error restarting all problematic connections: %s", "ERROR", e)
         return jsonify({"error": str(e)}), 500
 
 @api_bp.route('/debug_log', methods=['GET'])
@@ -252,7 +273,7 @@ def get_debug_log():
     """Get debug log"""
     try:
         # Return entries in reverse order (newest first)
-        return jsonify(list(reversed(debug_log)))
+        return jsonify(get_debug_log_entries())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
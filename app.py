@@ -8,7 +8,9 @@ from flask import Flask, render_template
 from config import NAV_ITEMS, REFRESH_INTERVAL_MS, API_BASE_URL
 from api import api_bp
 from monitoring import start_monitoring
-from utils import add_debug_log
+from alerts import start_alert_dispatcher
+from recording import start_recording
+from utils import add_debug_log, load_settings, configure_logging
 
 # Create Flask application
 app = Flask(__name__)
@@ -67,11 +69,14 @@ def internal_error(error):
 
 if __name__ == '__main__':
     # Initialize application on startup
+    configure_logging(load_settings())
     add_debug_log("MediaMTX Monitor application starting", "INFO")
-    add_debug_log(f"API Base URL: {API_BASE_URL}", "INFO")
-    add_debug_log(f"Refresh interval: {REFRESH_INTERVAL_MS}ms", "INFO")
+    add_debug_log("API Base URL: %s", "INFO", API_BASE_URL)
+    add_debug_log("Refresh interval: %dms", "INFO", REFRESH_INTERVAL_MS)
     
-    # Start monitoring worker
+    # Start alert dispatcher, snapshot recorder and monitoring worker
+    start_alert_dispatcher()
+    start_recording()
     start_monitoring()
     
     # Run Flask application
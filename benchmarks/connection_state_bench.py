@@ -0,0 +1,69 @@
+# benchmarks/connection_state_bench.py
+"""
+Memory and cycle-time benchmark for SRT connection state tracking.
+Compares the previous dict + datetime history with ConnectionTable.
+
+Run from the repository root:  python benchmarks/connection_state_bench.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connection_state import ConnectionTable
+
+def dict_history_cycle(history, items):
+    """State bookkeeping of check_srt_connections before ConnectionTable"""
+    now = datetime.now()
+    for conn in items:
+        conn_id = conn.get("id")
+        if conn_id not in history:
+            history[conn_id] = {"failure_count": 0, "last_restart": None, "last_check": now}
+        history[conn_id]["last_check"] = now
+    current_connection_ids = {conn.get("id") for conn in items}
+    for conn_id in list(history.keys()):
+        if conn_id not in current_connection_ids:
+            del history[conn_id]
+
+def connection_table_cycle(table, items):
+    """State bookkeeping of check_srt_connections with ConnectionTable"""
+    now = time.monotonic()
+    table.begin_cycle()
+    for conn in items:
+        state, _ = table.track(conn.get("id"), conn.get("path"), now)
+        state.last_check = now
+    table.end_cycle()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=50000)
+    parser.add_argument("--churn", type=int, default=5000, help="Connections replaced per cycle")
+    parser.add_argument("--cycles", type=int, default=20)
+    args = parser.parse_args()
+
+    snapshots = [[{"id": f"conn-{i}", "path": "live"}
+                  for i in range(cycle * args.churn, cycle * args.churn + args.connections)]
+                 for cycle in range(args.cycles)]
+
+    for name, factory, cycle in (("dict + datetime", dict, dict_history_cycle),
+                                 ("ConnectionTable", ConnectionTable, connection_table_cycle)):
+        tracemalloc.start()
+        state = factory()
+        cycle(state, snapshots[0])
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        state = factory()
+        cycle(state, snapshots[0])
+        started = time.perf_counter()
+        for items in snapshots[1:]:
+            cycle(state, items)
+        per_cycle = (time.perf_counter() - started) / (args.cycles - 1)
+        print(f"{name:16s} resident state {memory / 1e6:6.2f} MB  cycle {per_cycle * 1e3:6.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -28,7 +28,12 @@ DEFAULT_SETTINGS = {
     "max_rtt_threshold": 1000,  # Maximum RTT in milliseconds
     "min_bandwidth_threshold": 0.1,  # Minimum bandwidth in Mbps
     "buffer_size_threshold": 1048576,  # Maximum buffer size in bytes (1MB)
-    "consecutive_failures": 3  # Number of consecutive checks above threshold
+    "consecutive_failures": 3,  # Number of consecutive checks above threshold
+    "alert_sinks": [],  # Alert destinations, e.g. {"type": "webhook", "url": "..."}
+    "recording_enabled": False,  # Record upstream snapshots for offline replay
+    "recording_interval": 1,  # Snapshot recording interval in seconds
+    "log_level": "INFO",  # Minimum level recorded in the debug log
+    "log_file_enabled": False  # Also write the debug log to LOG_FILE
 }
 
 # Navigation items for the web interface
@@ -61,5 +66,34 @@ MTX_API_ENDPOINTS = {
 
 # File and logging configuration
 SETTINGS_FILE = "auto_restart_settings.json"
+RECORDING_DIR = "recordings"  # Daily append-only snapshot recordings for replay
+RECORDING_MAX_FILES = 7  # Number of daily recording files kept
+RECORDING_MAX_STRINGS = 50000  # Interned ids and paths before the string table starts over
 MAX_DEBUG_ENTRIES = 100  # Maximum number of debug log entries
-MAX_TRIGGER_ENTRIES = 50  # Maximum number of trigger history entries
\ No newline at end of file
+MAX_TRIGGER_ENTRIES = 50  # Maximum number of trigger history entries
+CHECK_STARTED_EVENT = "check_started"  # Published on the event bus when a monitor check starts
+CHECK_COMPLETED_EVENT = "check_completed"  # Published on the event bus when a monitor check ends
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}  # Same numbers as the logging module
+LOG_RATE_LIMIT_INTERVAL = 60  # Seconds between repeated log lines with the same key
+LOG_RATE_LIMIT_MAX_KEYS = 10000  # Rate limit state is reset beyond this many keys
+LOG_FILE = "monitor.log"  # JSON lines debug log file
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024  # Rotate log file at this size
+LOG_FILE_BACKUP_COUNT = 3  # Number of rotated log files kept
+LOG_QUEUE_SIZE = 10000  # Maximum number of log entries waiting for the file sink
+
+# Alert dispatcher configuration
+ALERT_QUEUE_SIZE = 1000  # Maximum number of queued alert events
+ALERT_BATCH_INTERVAL = 5  # Seconds without new events before a batch is sent (outside monitor checks)
+ALERT_MAX_BATCH_DELAY = 60  # Maximum seconds a batch is held open
+ALERT_SINK_QUEUE_SIZE = 100  # Maximum number of messages waiting for one sink
+ALERT_MAX_BATCH_SIZE = 500  # Maximum number of events per batch
+ALERT_MAX_RETRIES = 3  # Delivery attempts per sink and batch
+ALERT_RETRY_BACKOFF = 2  # Initial retry delay in seconds (doubled on each retry)
+ALERT_MAX_LISTED_CONNECTIONS = 10  # Connection ids listed per coalesced group
+ALERT_EVENT_TYPES = [  # Trigger types delivered to sinks unless a sink sets "events"
+    "restart_triggered",
+    "restart_completed",
+    "restart_failed",
+    "bulk_restart",
+    "connection_kicked"
+]
\ No newline at end of file
@@ -0,0 +1,164 @@
+# connection_state.py
+"""
+Compact connection state tracking for MediaMTX Monitor application.
+Holds per-connection failure/restart state in slotted records with monotonic
+timestamps and evicts departed connections generationally.
+"""
+
+import time
+from datetime import datetime
+
+class ConnectionState:
+    """Per-connection monitoring state"""
+    __slots__ = ("conn_id", "path", "failure_count", "last_restart", "last_check")
+
+    def __init__(self, conn_id, path, now):
+        self.conn_id = conn_id
+        self.path = path
+        self.failure_count = 0
+        self.last_restart = None  # time.monotonic() of last successful restart
+        self.last_check = now  # time.monotonic() of last check
+
+    def cooldown_expired(self, now, restart_cooldown):
+        """Check whether the connection may be restarted again"""
+        return self.last_restart is None or now - self.last_restart > restart_cooldown
+
+    def mark_restarted(self, now):
+        """Record a successful restart"""
+        self.last_restart = now
+        self.failure_count = 0
+
+    def to_dict(self):
+        """Convert state to a JSON-friendly dict with wall-clock timestamps"""
+        return {
+            "failure_count": self.failure_count,
+            "last_restart": _monotonic_to_wall(self.last_restart),
+            "last_check": _monotonic_to_wall(self.last_check)
+        }
+
+class ConnectionTable:
+    """
+    Connection id -> ConnectionState index with generational eviction.
+
+    Each monitoring cycle calls begin_cycle(), looks up every connection seen
+    in the snapshot via track(), then calls end_cycle(). Entries seen in the
+    cycle are promoted from the previous generation to the current one, so
+    whatever is left in the previous generation at the end is exactly the set
+    of departed connections; no full rescan or set difference is needed.
+    """
+
+    def __init__(self):
+        self._current = {}  # Connections seen in the current (or last completed) cycle
+        self._previous = {}  # Connections not yet seen in the running cycle
+
+    def begin_cycle(self):
+        """Start a new tracking generation"""
+        # Anything left over from an interrupted cycle is carried forward
+        self._current.update(self._previous)
+        self._previous = self._current
+        self._current = {}
+
+    def track(self, conn_id, path, now):
+        """Return (state, created) for a connection seen in the running cycle"""
+        state = self._previous.pop(conn_id, None)
+        if state is None:
+            state = self._current.get(conn_id)
+            if state is not None:
+                return state, False
+            state = self._current[conn_id] = ConnectionState(conn_id, path, now)
+            return state, True
+        self._current[conn_id] = state
+        return state, False
+
+    def end_cycle(self):
+        """Finish the running generation and evict departed connections"""
+        departed = self._previous
+        self._previous = {}
+        return list(departed)
+
+    def get(self, conn_id):
+        """Get state for a connection or None if it is not tracked"""
+        state = self._current.get(conn_id)
+        if state is None:
+            state = self._previous.get(conn_id)
+        return state
+
+    def __contains__(self, conn_id):
+        return conn_id in self._current or conn_id in self._previous
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+    def clear(self):
+        """Drop all tracked connections"""
+        self._current = {}
+        self._previous = {}
+
+    def snapshot(self):
+        """Return tracked connections as {conn_id: dict} for the web interface"""
+        result = {}
+        for generation in (self._previous, self._current):
+            for conn_id, state in list(generation.items()):
+                result[conn_id] = state.to_dict()
+        return result
+
+class Thresholds:
+    """
+    Restart thresholds read once from settings.
+
+    check() is the single definition of a connection issue, shared by the
+    live monitor and recording replay. Healthy samples take one combined
+    comparison and get an empty tuple back; only violating samples pay for
+    building the Violations of (trigger_type, value, threshold) tuples.
+    """
+    __slots__ = ("packet_loss", "rtt", "bandwidth", "buffer_size")
+
+    def __init__(self, settings):
+        self.packet_loss = settings.get("packet_loss_threshold", 5.0)  # Percent
+        self.rtt = settings.get("max_rtt_threshold", 1000)  # Milliseconds
+        self.bandwidth = settings.get("min_bandwidth_threshold", 0.1)  # Mbps
+        self.buffer_size = settings.get("buffer_size_threshold", 1048576)  # Bytes
+
+    def check(self, loss_rate, rtt, receive_rate, buffer_size):
+        """Get (trigger_type, value, threshold) for each threshold a sample exceeds"""
+        loss_percent = loss_rate * 100
+        if not (loss_percent > self.packet_loss or rtt > self.rtt or
+                0 < receive_rate < self.bandwidth or buffer_size > self.buffer_size):
+            return ()
+        violations = []
+        if loss_percent > self.packet_loss:
+            violations.append(("packet_loss", loss_percent, self.packet_loss))
+        if rtt > self.rtt:
+            violations.append(("rtt", rtt, self.rtt))
+        if 0 < receive_rate < self.bandwidth:
+            violations.append(("bandwidth", receive_rate, self.bandwidth))
+        if buffer_size > self.buffer_size:
+            violations.append(("buffer_size", buffer_size, self.buffer_size))
+        return Violations(violations)
+
+class Violations(tuple):
+    """Threshold violations of one sample, formatted as restart reasons only when rendered"""
+    __slots__ = ()
+
+    def __str__(self):
+        return format_violations(self)
+
+# Human-readable restart reason per trigger type, formatted with (value, threshold)
+VIOLATION_FORMATS = {
+    "packet_loss": "Packet loss: {:.2f}% > {}%",
+    "rtt": "High RTT: {}ms > {}ms",
+    "bandwidth": "Low bandwidth: {:.3f}Mbps < {}Mbps",
+    "buffer_size": "Large buffer: {} bytes > {} bytes"
+}
+
+def format_violations(violations):
+    """Format threshold violations as a restart reason string"""
+    return ", ".join(VIOLATION_FORMATS[trigger_type].format(value, threshold)
+                     for trigger_type, value, threshold in violations)
+
+def _monotonic_to_wall(value):
+    """Convert a time.monotonic() value to a wall-clock timestamp string"""
+    if value is None:
+        return None
+    wall = time.time() - (time.monotonic() - value)
+    return datetime.fromtimestamp(wall).strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,419 @@
+# recording.py
+"""
+Snapshot recording and offline replay for MediaMTX Monitor application.
+Appends upstream SRT connection and path snapshots to a compact compressed
+file and replays them through the restart decision logic without kicking.
+"""
+
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+import requests
+from datetime import datetime
+from config import API_BASE_URL, MTX_API_ENDPOINTS, RECORDING_DIR, RECORDING_MAX_FILES, RECORDING_MAX_STRINGS
+from utils import load_settings, add_debug_log
+from connection_state import ConnectionState, Thresholds
+
+# Recording file layout: RECORDING_MAGIC followed by frames of
+#   FRAME_HEADER (timestamp, flags, strings block length, payload length)
+#   strings block: strings first used in this frame, STRING_LENGTH + utf-8 each
+#   payload (zlib): COUNT + SRT_RECORD * n, COUNT + PATH_RECORD * m
+# Connection ids and path names are interned, records refer to them by index.
+# The string table starts over on FLAG_TABLE_RESET frames: when a writer opens
+# a file and whenever the table reaches RECORDING_MAX_STRINGS.
+RECORDING_MAGIC = b"MTXREC1\n"
+FRAME_HEADER = struct.Struct("<dBII")
+STRING_LENGTH = struct.Struct("<H")
+COUNT = struct.Struct("<I")
+SRT_RECORD = struct.Struct("<IIdddQ")  # id, path, packetsReceivedLossRate, msRTT, mbpsReceiveRate, bytesReceiveBuf
+PATH_RECORD = struct.Struct("<IBH")  # name, ready, readers count
+FLAG_SESSION_START = 1  # Recorder (and monitor) restarted, replay state starts over
+FLAG_TABLE_RESET = 2  # String table starts over
+TABLE_RESET_FLAGS = FLAG_SESSION_START | FLAG_TABLE_RESET
+
+# Global recording variables
+recording_thread = None
+recording_active = False
+
+class SnapshotReader:
+    """Memory-mapped reader for snapshot recordings"""
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.mm = None
+        if os.fstat(self.file.fileno()).st_size > 0:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.mm[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+                self.close()
+                raise ValueError(f"{filename} is not a snapshot recording")
+
+    def close(self):
+        """Release the mapping and the file"""
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def frames(self):
+        """Yield (timestamp, flags, strings_start, payload_start, end) for each complete frame"""
+        if self.mm is None:
+            return
+        mm = self.mm
+        size = len(mm)
+        offset = len(RECORDING_MAGIC)
+        while offset + FRAME_HEADER.size <= size:
+            timestamp, flags, strings_length, payload_length = FRAME_HEADER.unpack_from(mm, offset)
+            strings_start = offset + FRAME_HEADER.size
+            payload_start = strings_start + strings_length
+            end = payload_start + payload_length
+            if end > size:
+                break  # Truncated frame from an interrupted write
+            yield timestamp, flags, strings_start, payload_start, end
+            offset = end
+
+    def valid_length(self):
+        """Get file length up to the end of the last complete frame"""
+        end = len(RECORDING_MAGIC) if self.mm is not None else 0
+        for frame in self.frames():
+            end = frame[4]
+        return end
+
+    def read_strings(self, start, end, strings):
+        """Append strings defined in a frame to the string table"""
+        mm = self.mm
+        while start < end:
+            (length,) = STRING_LENGTH.unpack_from(mm, start)
+            start += STRING_LENGTH.size
+            strings.append(mm[start:start + length].decode("utf-8"))
+            start += length
+
+    def read_payload(self, start, end):
+        """Decompress a frame payload"""
+        return zlib.decompress(self.mm[start:end])
+
+    def snapshots(self):
+        """Yield (timestamp, srt_items, path_items) with decoded records"""
+        strings = []
+        for timestamp, flags, strings_start, payload_start, end in self.frames():
+            if flags & TABLE_RESET_FLAGS:
+                strings = []
+            self.read_strings(strings_start, payload_start, strings)
+            payload = self.read_payload(payload_start, end)
+
+            (srt_count,) = COUNT.unpack_from(payload)
+            srt_end = COUNT.size + srt_count * SRT_RECORD.size
+            srt_items = [{
+                "id": strings[conn_index],
+                "path": strings[path_index],
+                "packetsReceivedLossRate": loss_rate,
+                "msRTT": rtt,
+                "mbpsReceiveRate": receive_rate,
+                "bytesReceiveBuf": buffer_size
+            } for conn_index, path_index, loss_rate, rtt, receive_rate, buffer_size
+                in SRT_RECORD.iter_unpack(payload[COUNT.size:srt_end])]
+
+            (path_count,) = COUNT.unpack_from(payload, srt_end)
+            paths_start = srt_end + COUNT.size
+            path_items = [{
+                "name": strings[name_index],
+                "ready": bool(ready),
+                "readers_count": readers_count
+            } for name_index, ready, readers_count
+                in PATH_RECORD.iter_unpack(payload[paths_start:paths_start + path_count * PATH_RECORD.size])]
+
+            yield timestamp, srt_items, path_items
+
+class SnapshotWriter:
+    """Append-only writer for snapshot recordings"""
+
+    def __init__(self, filename, session_start=True):
+        self.filename = filename
+        if os.path.exists(filename):
+            # Drop a frame left incomplete by an interrupted write
+            with SnapshotReader(filename) as reader:
+                valid_length = reader.valid_length()
+            if valid_length != os.path.getsize(filename):
+                os.truncate(filename, valid_length)
+        self.file = open(filename, "ab")
+        if self.file.tell() == 0:
+            self.file.write(RECORDING_MAGIC)
+        self.strings = {}
+        # Each file starts its own string table, so it can be replayed on its own
+        self.flags = FLAG_TABLE_RESET | (FLAG_SESSION_START if session_start else 0)
+
+    def close(self):
+        """Close the recording file"""
+        self.file.close()
+
+    def intern(self, value, new_strings):
+        """Get string table index for value, defining it in this frame if new"""
+        value = str(value)
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+            encoded = value.encode("utf-8")[:0xFFFF]
+            new_strings.append(STRING_LENGTH.pack(len(encoded)) + encoded)
+        return index
+
+    def write(self, timestamp, srt_items, path_items):
+        """Append one snapshot of SRT connections and paths"""
+        if len(self.strings) >= RECORDING_MAX_STRINGS:
+            self.strings = {}
+            self.flags |= FLAG_TABLE_RESET
+        new_strings = []
+        parts = [COUNT.pack(len(srt_items))]
+        for conn in srt_items:
+            parts.append(SRT_RECORD.pack(
+                self.intern(conn.get("id", "unknown"), new_strings),
+                self.intern(conn.get("path", "unknown"), new_strings),
+                conn.get("packetsReceivedLossRate") or 0,
+                conn.get("msRTT") or 0,
+                conn.get("mbpsReceiveRate") or 0,
+                int(conn.get("bytesReceiveBuf") or 0)
+            ))
+        parts.append(COUNT.pack(len(path_items)))
+        for path_info in path_items:
+            parts.append(PATH_RECORD.pack(
+                self.intern(path_info.get("name", "unknown"), new_strings),
+                1 if path_info.get("ready", False) else 0,
+                min(len(path_info.get("readers") or []), 0xFFFF)
+            ))
+
+        strings = b"".join(new_strings)
+        payload = zlib.compress(b"".join(parts))
+        self.file.write(FRAME_HEADER.pack(timestamp, self.flags, len(strings), len(payload)) + strings + payload)
+        self.file.flush()
+        self.flags = 0
+
+def get_recording_filename(timestamp):
+    """Get daily recording file for a timestamp"""
+    return os.path.join(RECORDING_DIR, datetime.fromtimestamp(timestamp).strftime("snapshots-%Y%m%d.mtxrec"))
+
+def list_recordings():
+    """Get recording files, oldest first"""
+    return sorted(glob.glob(os.path.join(RECORDING_DIR, "snapshots-*.mtxrec")))
+
+def prune_recordings():
+    """Delete the oldest recording files beyond RECORDING_MAX_FILES"""
+    recordings = list_recordings()
+    for filename in recordings[:max(0, len(recordings) - RECORDING_MAX_FILES)]:
+        os.remove(filename)
+        add_debug_log("Deleted old recording %s", "INFO", filename)
+
+def replay_recording(filenames, settings, interval=None):
+    """
+    Replay recording files, in order, through the restart decision logic of
+    check_srt_connections without kicking anything.
+
+    Snapshots are evaluated every `interval` seconds of recorded time
+    (monitor_interval by default). Every triggered restart is assumed to
+    succeed; the recorded connection keeps being evaluated afterwards.
+    """
+    check_thresholds = Thresholds(settings).check
+    consecutive_threshold = settings.get("consecutive_failures", 3)
+    restart_cooldown = settings.get("restart_cooldown", 300)
+    if interval is None:
+        interval = settings.get("monitor_interval", 30)
+
+    started = time.perf_counter()
+    strings = []
+    states = {}  # String index -> state, only with failures or a restart in cooldown
+    pending = {}  # Connection id -> state waiting to be re-indexed after a table reset
+    restarts = []
+    frames = 0
+    evaluated = 0
+    samples = 0
+    first_timestamp = None
+    last_timestamp = None
+    last_evaluated = None
+    unpack_srt = SRT_RECORD.iter_unpack
+
+    for filename in filenames:
+        with SnapshotReader(filename) as reader:
+            for timestamp, flags, strings_start, payload_start, end in reader.frames():
+                frames += 1
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                last_timestamp = timestamp
+                if flags & FLAG_SESSION_START:
+                    # Recorder (and with it the monitor) restarted
+                    states = {}
+                    pending = {}
+                if flags & TABLE_RESET_FLAGS:
+                    strings = []
+                    # Keep state by id until the new table defines it again
+                    pending.update((state.conn_id, state) for state in states.values())
+                    states = {}
+                if payload_start > strings_start:
+                    defined = len(strings)
+                    reader.read_strings(strings_start, payload_start, strings)
+                    if pending:
+                        for index in range(defined, len(strings)):
+                            state = pending.pop(strings[index], None)
+                            if state is not None:
+                                states[index] = state
+                if last_evaluated is not None and timestamp - last_evaluated < interval:
+                    continue
+                last_evaluated = timestamp
+
+                payload = reader.read_payload(payload_start, end)
+                (srt_count,) = COUNT.unpack_from(payload)
+                if not srt_count:
+                    continue  # Live check returns early without touching history
+                evaluated += 1
+                samples += srt_count
+
+                records = memoryview(payload)[COUNT.size:COUNT.size + srt_count * SRT_RECORD.size]
+                for conn_index, path_index, loss_rate, rtt, receive_rate, buffer_size in unpack_srt(records):
+                    violations = check_thresholds(loss_rate, rtt, receive_rate, buffer_size)
+                    if violations:
+                        state = states.get(conn_index)
+                        if state is None:
+                            state = states[conn_index] = ConnectionState(
+                                strings[conn_index], strings[path_index], timestamp)
+                        state.failure_count += 1
+                        if (state.failure_count >= consecutive_threshold and
+                                state.cooldown_expired(timestamp, restart_cooldown)):
+                            restarts.append({
+                                "timestamp": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+                                "connection_id": state.conn_id,
+                                "path": state.path,
+                                "failure_count": state.failure_count,
+                                "reasons": [trigger_type for trigger_type, _, _ in violations]
+                            })
+                            state.mark_restarted(timestamp)
+                        state.last_check = timestamp
+                    elif states and conn_index in states:
+                        state = states[conn_index]
+                        if state.last_restart is None:
+                            del states[conn_index]
+                        else:
+                            state.failure_count = 0
+                            state.last_check = timestamp
+
+                # Evict departed connections, including any not re-indexed by this frame
+                pending = {}
+                if states:
+                    for conn_index in [k for k, s in states.items() if s.last_check != timestamp]:
+                        del states[conn_index]
+
+    restarts_by_path = {}
+    for restart in restarts:
+        restarts_by_path[restart["path"]] = restarts_by_path.get(restart["path"], 0) + 1
+
+    return {
+        "files": list(filenames),
+        "frames": frames,
+        "evaluated_snapshots": evaluated,
+        "connection_samples": samples,
+        "recorded_seconds": (last_timestamp - first_timestamp) if frames else 0,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "restart_count": len(restarts),
+        "restarts_by_path": restarts_by_path,
+        "restarts": restarts
+    }
+
+def fetch_items(section_key):
+    """Fetch item list from a MediaMTX API endpoint"""
+    r = requests.get(API_BASE_URL + MTX_API_ENDPOINTS[section_key], timeout=5)
+    r.raise_for_status()
+    data = r.json()
+    return (data.get("items") or []) if data else []
+
+def recording_worker():
+    """Background worker for snapshot recording"""
+    global recording_active
+    writer = None
+    session_started = False  # Only the first file of this process starts a session
+    add_debug_log("Snapshot recorder started", "INFO")
+    while recording_active:
+        started = time.monotonic()
+        settings = load_settings()
+        try:
+            if settings.get("recording_enabled", False):
+                now = time.time()
+                filename = get_recording_filename(now)
+                if writer is None or writer.filename != filename:
+                    # A new day or re-enabled recording continues the session in a new file
+                    if writer is not None:
+                        writer.close()
+                    os.makedirs(RECORDING_DIR, exist_ok=True)
+                    writer = SnapshotWriter(filename, not session_started)
+                    session_started = True
+                    add_debug_log("Recording snapshots to %s", "INFO", filename)
+                    prune_recordings()
+                writer.write(now, fetch_items("srt_conns"), fetch_items("paths"))
+            elif writer is not None:
+                writer.close()
+                writer = None
+                add_debug_log("Snapshot recording stopped", "INFO")
+        except requests.exceptions.RequestException as e:
+            add_debug_log("Network error recording snapshot: %s", "ERROR", e, key="recording_network_error")
+        except Exception as e:
+            add_debug_log("Error recording snapshot: %s", "ERROR", e, key="recording_error")
+        interval = settings.get("recording_interval", 1)
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+    if writer is not None:
+        writer.close()
+    add_debug_log("Snapshot recorder stopped", "INFO")
+
+def start_recording():
+    """Start snapshot recorder"""
+    global recording_thread, recording_active
+    if not recording_active:
+        recording_active = True
+        recording_thread = threading.Thread(target=recording_worker, daemon=True)
+        recording_thread.start()
+
+def stop_recording():
+    """Stop snapshot recorder"""
+    global recording_active
+    recording_active = False
+
+def parse_setting_override(text):
+    """Parse KEY=VALUE setting override, VALUE as JSON when possible"""
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded snapshots through the auto-restart logic")
+    parser.add_argument("files", nargs="*", help=f"Recording files in time order (defaults to all in {RECORDING_DIR}/)")
+    parser.add_argument("--settings", help="JSON settings file (defaults to the saved settings)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a setting, e.g. --set packet_loss_threshold=2.5")
+    parser.add_argument("--interval", type=float,
+                        help="Seconds of recorded time between checks (defaults to monitor_interval)")
+    parser.add_argument("--json", action="store_true", help="Print full report as JSON")
+    args = parser.parse_args()
+
+    replay_settings = load_settings()
+    if args.settings:
+        with open(args.settings, 'r') as f:
+            replay_settings.update(json.load(f))
+    replay_settings.update(parse_setting_override(item) for item in args.set)
+
+    report = replay_recording(args.files or list_recordings(), replay_settings, args.interval)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for restart in report["restarts"]:
+            print(f"{restart['timestamp']}  {restart['connection_id']} ({restart['path']})  "
+                  f"after {restart['failure_count']} failures: {', '.join(restart['reasons'])}")
+        print(f"{report['restart_count']} restarts over {report['recorded_seconds']:.0f}s recorded, "
+              f"{report['evaluated_snapshots']} checks of {report['frames']} snapshots, "
+              f"{report['connection_samples']} connection samples in {report['elapsed_seconds']}s")
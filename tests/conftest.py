@@ -0,0 +1,10 @@
+# tests/conftest.py
+"""
+Shared test setup for MediaMTX Monitor application.
+Makes the top-level application modules importable from the tests directory.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
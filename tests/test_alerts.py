@@ -0,0 +1,198 @@
+# tests/test_alerts.py
+"""
+Tests for alert dispatching against a local stub webhook receiver.
+"""
+
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import alerts
+import utils
+from config import CHECK_STARTED_EVENT, CHECK_COMPLETED_EVENT
+
+class StubReceiver(BaseHTTPRequestHandler):
+    """Webhook receiver recording delivered messages"""
+    messages = []
+    attempts = 0
+    fail = False
+
+    def do_POST(self):
+        type(self).attempts += 1
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if type(self).fail:
+            self.send_response(500)
+        else:
+            type(self).messages.append(json.loads(body))
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def receiver():
+    StubReceiver.messages = []
+    StubReceiver.attempts = 0
+    StubReceiver.fail = False
+    server = HTTPServer(("127.0.0.1", 0), StubReceiver)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", StubReceiver
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def dispatcher_state(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "event_subscribers", [])
+    monkeypatch.setattr(utils, "trigger_history", [])
+    monkeypatch.setattr(alerts, "dispatcher_active", True)
+    monkeypatch.setattr(alerts, "alert_queue", queue.Queue(maxsize=alerts.ALERT_QUEUE_SIZE))
+    monkeypatch.setattr(alerts, "alert_stats", dict(alerts.alert_stats, published=0, dropped=0, batches=0,
+                                                    delivered=0, failed=0, retries=0, last_error=None))
+    monkeypatch.setattr(alerts, "alert_sinks", [])
+    monkeypatch.setattr(alerts, "alert_event_filter", frozenset())
+    monkeypatch.setattr(alerts, "reported_drops", {})
+    monkeypatch.setattr(alerts, "sink_workers", {})
+    monkeypatch.setattr(alerts, "check_in_progress", False)
+    monkeypatch.setattr(alerts, "ALERT_BATCH_INTERVAL", 0.1)
+    monkeypatch.setattr(alerts, "ALERT_RETRY_BACKOFF", 0.01)
+    utils.subscribe_events(alerts.enqueue_alert_event)
+    yield
+    for worker in alerts.sink_workers.values():
+        worker.stop()
+
+def kick(index, action="success"):
+    utils.add_trigger_event(f"conn-{index}", f"live{index}", "connection_kicked", 200, 200, action)
+
+def marker(trigger_type):
+    utils.publish_event(utils.build_event(None, None, trigger_type, 0, 0, "check"))
+
+def dispatch():
+    alerts.dispatch_batch(alerts.collect_batch())
+    alerts.wait_for_sinks()
+
+def test_kicks_are_coalesced_into_one_message(receiver):
+    url, stub = receiver
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url}]})
+    for i in range(50):
+        kick(i)
+
+    dispatch()
+
+    assert len(stub.messages) == 1
+    message = stub.messages[0]
+    assert message["event_count"] == 50
+    assert len(message["groups"]) == 1
+    assert message["groups"][0]["count"] == 50
+    assert len(message["groups"][0]["connections"]) == 50
+
+def test_slow_kicks_in_one_check_are_one_message(receiver):
+    url, stub = receiver
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url}]})
+    batches = []
+    collector = threading.Thread(target=lambda: batches.append(alerts.collect_batch()))
+
+    marker(CHECK_STARTED_EVENT)
+    collector.start()
+    for i in range(5):
+        kick(i)
+        time.sleep(alerts.ALERT_BATCH_INTERVAL * 1.5)  # Slower than the batch interval
+    marker(CHECK_COMPLETED_EVENT)
+    collector.join(5)
+
+    alerts.dispatch_batch(batches[0])
+    alerts.wait_for_sinks()
+    assert [m["event_count"] for m in stub.messages] == [5]
+
+def test_quiet_window_slides_with_each_event(receiver):
+    url, stub = receiver
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url}]})
+    batches = []
+    collector = threading.Thread(target=lambda: batches.append(alerts.collect_batch()))
+
+    collector.start()
+    kick(0)
+    time.sleep(alerts.ALERT_BATCH_INTERVAL * 0.6)
+    kick(1)
+    time.sleep(alerts.ALERT_BATCH_INTERVAL * 0.6)
+    kick(2)
+    collector.join(5)
+
+    assert len(batches[0]) == 3
+
+def test_events_without_sink_are_not_queued(receiver):
+    url, _ = receiver
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url}]})
+    for i in range(1500):
+        utils.add_trigger_event(f"conn-{i}", "live", "packet_loss", 9.0, 5.0, "threshold_exceeded")
+    kick(0)
+
+    assert alerts.alert_stats["dropped"] == 0
+    assert alerts.alert_queue.qsize() == 1
+
+def test_failed_delivery_is_retried_then_counted(receiver):
+    url, stub = receiver
+    stub.fail = True
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url}]})
+    kick(0)
+
+    dispatch()
+
+    assert stub.attempts == alerts.ALERT_MAX_RETRIES
+    assert alerts.alert_stats["retries"] == alerts.ALERT_MAX_RETRIES - 1
+    assert alerts.alert_stats["failed"] == 1
+    assert alerts.alert_stats["delivered"] == 0
+
+def test_dead_sink_does_not_delay_other_sinks(receiver, monkeypatch, tmp_path):
+    url, stub = receiver
+    stub.fail = True
+    monkeypatch.setattr(alerts, "ALERT_RETRY_BACKOFF", 1)
+    alert_file = tmp_path / "alerts.jsonl"
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url},
+                                             {"type": "file", "path": str(alert_file)}]})
+    kick(0)
+
+    started = time.monotonic()
+    alerts.dispatch_batch(alerts.collect_batch())
+    file_worker = alerts.sink_workers[alerts.get_sink_key({"type": "file", "path": str(alert_file)})]
+    file_worker.queue.join()
+
+    assert time.monotonic() - started < 0.9
+    assert json.loads(alert_file.read_text())["event_count"] == 1
+    assert alerts.alert_stats["failed"] == 0  # Webhook still backing off
+
+def test_drops_are_reported_once_delivered(receiver, monkeypatch):
+    url, stub = receiver
+    monkeypatch.setattr(alerts, "alert_queue", queue.Queue(maxsize=5))
+    alerts.configure_alerts({"alert_sinks": [{"type": "webhook", "url": url}]})
+    for i in range(8):
+        kick(i)
+    assert alerts.alert_stats["published"] == 5
+    assert alerts.alert_stats["dropped"] == 3
+
+    # A failed delivery must not use up the drop count
+    stub.fail = True
+    dispatch()
+    stub.fail = False
+    kick(100)
+    dispatch()
+    kick(101)
+    dispatch()
+
+    assert [m["dropped_events"] for m in stub.messages] == [3, 0]
+
+def test_syslog_address_defaults_to_port_514():
+    assert alerts.parse_syslog_address("syslog.local") == ("syslog.local", 514)
+    assert alerts.parse_syslog_address("syslog.local:1514") == ("syslog.local", 1514)
+    assert alerts.validate_alert_sink({"type": "syslog", "address": "syslog.local"}) == []
+    assert alerts.validate_alert_sink({"type": "syslog", "address": "syslog.local:x"})
+    assert alerts.validate_alert_sinks([{"type": "pager"}, {"type": "webhook"}]) == [
+        "alert_sinks[0]: unknown sink type: pager",
+        "alert_sinks[1]: webhook sink requires \"url\""
+    ]
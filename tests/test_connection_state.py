@@ -0,0 +1,85 @@
+# tests/test_connection_state.py
+"""
+Tests for slotted connection state and generational eviction.
+"""
+
+from connection_state import ConnectionTable, Thresholds, format_violations
+
+def run_cycle(table, conn_ids, now=0.0):
+    table.begin_cycle()
+    for conn_id in conn_ids:
+        table.track(conn_id, f"path-{conn_id}", now)
+    return table.end_cycle()
+
+def test_departed_connections_are_evicted():
+    table = ConnectionTable()
+    assert run_cycle(table, ["a", "b", "c"]) == []
+    assert sorted(run_cycle(table, ["b", "d"])) == ["a", "c"]
+    assert "a" not in table
+    assert "d" in table
+    assert len(table) == 2
+
+def test_state_survives_across_cycles():
+    table = ConnectionTable()
+    run_cycle(table, ["a"])
+    table.get("a").failure_count = 2
+    table.begin_cycle()
+    state, created = table.track("a", "path-a", 1.0)
+    table.end_cycle()
+    assert not created
+    assert state.failure_count == 2
+
+def test_interrupted_cycle_carries_state_forward():
+    table = ConnectionTable()
+    run_cycle(table, ["a", "b"])
+    table.get("b").failure_count = 1
+
+    # Cycle aborted (e.g. by an exception) before end_cycle()
+    table.begin_cycle()
+    table.track("a", "path-a", 1.0)
+
+    assert sorted(run_cycle(table, ["a", "b"])) == []
+    assert table.get("b").failure_count == 1
+
+def test_duplicate_ids_in_one_snapshot_share_state():
+    table = ConnectionTable()
+    table.begin_cycle()
+    first, created_first = table.track("a", "path-a", 0.0)
+    second, created_second = table.track("a", "path-a", 0.0)
+    assert table.end_cycle() == []
+    assert first is second
+    assert (created_first, created_second) == (True, False)
+    assert len(table) == 1
+
+def test_get_and_snapshot_span_both_generations():
+    table = ConnectionTable()
+    run_cycle(table, ["a", "b"])
+    table.get("a").failure_count = 3
+
+    # Mid-cycle: "b" already promoted, "a" still in the previous generation
+    table.begin_cycle()
+    table.track("b", "path-b", 1.0)
+    assert table.get("a").failure_count == 3
+    assert table.get("b") is not None
+    assert "a" in table and "b" in table
+    snapshot = table.snapshot()
+    assert set(snapshot) == {"a", "b"}
+    assert snapshot["a"]["failure_count"] == 3
+    assert snapshot["a"]["last_restart"] is None
+
+def test_clear_drops_everything():
+    table = ConnectionTable()
+    run_cycle(table, ["a"])
+    table.clear()
+    assert len(table) == 0
+    assert table.get("a") is None
+
+def test_thresholds_report_each_violation():
+    thresholds = Thresholds({"packet_loss_threshold": 5.0, "max_rtt_threshold": 100,
+                             "min_bandwidth_threshold": 0.5, "buffer_size_threshold": 1000})
+    assert thresholds.check(0.01, 50, 0, 10) == ()
+    violations = thresholds.check(0.1, 150, 0.2, 2000)
+    assert [(t, round(v, 6), th) for t, v, th in violations] == [
+        ("packet_loss", 10.0, 5.0), ("rtt", 150, 100), ("bandwidth", 0.2, 0.5), ("buffer_size", 2000, 1000)
+    ]
+    assert format_violations(violations[1:2]) == "High RTT: 150ms > 100ms"
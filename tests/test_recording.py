@@ -0,0 +1,62 @@
+# tests/test_recording.py
+"""
+Tests for snapshot recording string table resets and replay across files.
+"""
+
+import recording
+
+def conn(conn_id, loss=0.0):
+    return {"id": conn_id, "path": f"path-{conn_id}", "packetsReceivedLossRate": loss}
+
+def test_string_table_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(recording, "RECORDING_MAX_STRINGS", 10)
+    filename = str(tmp_path / "churn.mtxrec")
+    writer = recording.SnapshotWriter(filename)
+    for i in range(100):
+        writer.write(float(i), [conn(f"c{i}"), conn(f"c{i + 1}")], [])
+        assert len(writer.strings) <= 10 + 4
+    writer.close()
+
+    with recording.SnapshotReader(filename) as reader:
+        snapshots = list(reader.snapshots())
+    assert [[item["id"] for item in srt] for _, srt, _ in snapshots][-1] == ["c99", "c100"]
+
+def test_replay_keeps_state_across_table_reset_and_daily_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(recording, "RECORDING_MAX_STRINGS", 2)
+    first = str(tmp_path / "day1.mtxrec")
+    second = str(tmp_path / "day2.mtxrec")
+    writer = recording.SnapshotWriter(first)
+    writer.write(0.0, [conn("a", 0.5)], [])
+    writer.write(1.0, [conn("a", 0.5)], [])
+    writer.close()
+    writer = recording.SnapshotWriter(second, session_start=False)
+    writer.write(2.0, [conn("a", 0.5)], [])
+    writer.close()
+
+    settings = {"consecutive_failures": 3, "restart_cooldown": 300}
+    report = recording.replay_recording([first, second], settings, interval=0)
+
+    assert report["frames"] == 3
+    assert [(r["connection_id"], r["path"], r["failure_count"]) for r in report["restarts"]] == [("a", "path-a", 3)]
+
+def test_reenabling_recording_does_not_start_a_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cycles = iter([{"recording_enabled": True}, {"recording_enabled": False}, {"recording_enabled": True}])
+
+    def next_settings():
+        settings = next(cycles, None)
+        if settings is None:
+            recording.recording_active = False
+            return {}
+        return settings
+
+    monkeypatch.setattr(recording, "recording_active", True)
+    monkeypatch.setattr(recording, "load_settings", next_settings)
+    monkeypatch.setattr(recording, "fetch_items", lambda section_key: [conn("a")] if section_key == "srt_conns" else [])
+    monkeypatch.setattr(recording.time, "sleep", lambda seconds: None)
+    recording.recording_worker()
+
+    (filename,) = recording.list_recordings()
+    with recording.SnapshotReader(filename) as reader:
+        flags = [frame[1] for frame in reader.frames()]
+    assert flags == [recording.FLAG_SESSION_START | recording.FLAG_TABLE_RESET, recording.FLAG_TABLE_RESET]
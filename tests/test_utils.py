@@ -0,0 +1,91 @@
+# tests/test_utils.py
+"""
+Tests for debug log level gating, argument snapshots and the file sink.
+"""
+
+import json
+
+import pytest
+
+import utils
+from connection_state import Thresholds
+
+@pytest.fixture(autouse=True)
+def log_state(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "log_rate_limits", {})
+    utils.clear_debug_log()
+    yield
+    utils.configure_logging({"log_level": "INFO", "log_file_enabled": False})
+
+class FormatSpy:
+    """Log message/arg recording every attempt to format it"""
+    def __init__(self):
+        self.calls = []
+
+    def __str__(self):
+        self.calls.append("__str__")
+        return "spy"
+
+    def __repr__(self):
+        self.calls.append("__repr__")
+        return "spy"
+
+    def __format__(self, spec):
+        self.calls.append("__format__")
+        return "spy"
+
+    def __mod__(self, args):
+        self.calls.append("__mod__")
+        return "spy"
+
+def test_debug_is_filtered_before_formatting():
+    utils.configure_logging({"log_level": "INFO"})
+    message, arg = FormatSpy(), FormatSpy()
+    utils.add_debug_log(message, "DEBUG", arg)
+    utils.add_debug_log("hidden %s", "DEBUG", arg, key="hidden")
+    utils.add_debug_log("shown %s", "INFO", "y")
+
+    assert message.calls == []
+    assert arg.calls == []
+    assert [e["message"] for e in utils.get_debug_log_entries()][0] == "shown y"
+    assert len(utils.debug_log) == 2  # "cleared" entry from the fixture and "shown y"
+
+def test_violations_are_formatted_when_read():
+    violations = Thresholds({"max_rtt_threshold": 100}).check(0, 150, 0, 0)
+    utils.add_debug_log("issue: %s", "WARNING", violations)
+
+    assert utils.debug_log[-1][3] == (violations,)
+    assert utils.get_debug_log_entries()[0]["message"] == "issue: High RTT: 150ms > 100ms"
+
+def test_non_scalar_args_are_snapshotted():
+    def fail():
+        payload = bytearray(1024)  # Must not be kept alive through the traceback
+        raise ValueError("boom")
+    try:
+        fail()
+    except ValueError as e:
+        utils.add_debug_log("error: %s", "ERROR", e)
+    items = [1]
+    utils.add_debug_log("list %s, count %d, rate %.1f", "INFO", items, 3, 0.5)
+    items.append(2)
+
+    assert utils.debug_log[-2][3] == ("boom",)
+    assert utils.get_debug_log_entries()[0]["message"] == "list [1], count 3, rate 0.5"
+
+def test_log_sink_restart_keeps_single_writer():
+    utils.configure_logging({"log_file_enabled": True})
+    first = utils.log_sink_thread
+    utils.configure_logging({"log_file_enabled": True})
+    assert utils.log_sink_thread is first
+    utils.add_debug_log("line %d", "INFO", 1)
+
+    utils.configure_logging({"log_file_enabled": False})
+    assert not first.is_alive()
+    utils.configure_logging({"log_file_enabled": True})
+    utils.add_debug_log("line %d", "INFO", 2)
+    utils.configure_logging({"log_file_enabled": False})
+
+    with open(utils.LOG_FILE) as f:
+        messages = [json.loads(line)["message"] for line in f]
+    assert messages[-2:] == ["line 1", "line 2"]
@@ -5,45 +5,193 @@ Contains reusable functions for settings, logging, and data formatting.
 """
 
 import json
+import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from config import DEFAULT_SETTINGS, SETTINGS_FILE, MAX_DEBUG_ENTRIES, MAX_TRIGGER_ENTRIES
+from config import (
+    DEFAULT_SETTINGS, SETTINGS_FILE, MAX_DEBUG_ENTRIES, MAX_TRIGGER_ENTRIES, LOG_LEVELS,
+    LOG_RATE_LIMIT_INTERVAL, LOG_RATE_LIMIT_MAX_KEYS, LOG_FILE, LOG_FILE_MAX_BYTES,
+    LOG_FILE_BACKUP_COUNT, LOG_QUEUE_SIZE
+)
 
 # Global variables for logging
-debug_log = []  # Debug log entries
+debug_log = deque(maxlen=MAX_DEBUG_ENTRIES)  # Raw (created, level, message, args, suppressed) entries
 trigger_history = []  # Trigger event history
+event_subscribers = []  # Callbacks receiving published events (alert dispatcher etc.)
+log_level_threshold = LOG_LEVELS[DEFAULT_SETTINGS["log_level"]]  # Minimum level number recorded
+log_rate_limits = {}  # Message key -> [last emitted time, suppressed count]
+log_sink_queue = None  # Queue feeding the file sink thread, None when disabled
+log_sink_thread = None
+log_sink_lock = threading.Lock()  # Serializes starting and stopping the file sink
+log_sink_stats = {"written": 0, "dropped": 0}
 
-def add_debug_log(message, level="INFO"):
-    """Add entry to debug log"""
-    global debug_log
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    debug_log.append({
-        "timestamp": timestamp,
+def add_debug_log(message, level="INFO", *args, key=None):
+    """
+    Add entry to debug log.
+
+    The level is checked before anything else is done; `message % args` is
+    only formatted when the entry is read or written to the log file.
+    Entries with a `key` are rate limited to one per LOG_RATE_LIMIT_INTERVAL.
+    Only str, int and float args and tuples of them are kept as is, anything
+    else (exceptions with their tracebacks, mutable containers) is converted
+    to str here.
+    """
+    if LOG_LEVELS.get(level, logging.INFO) < log_level_threshold:
+        return
+    created = time.time()
+    suppressed = 0
+    if key is not None:
+        limit = log_rate_limits.get(key)
+        if limit is not None:
+            if created - limit[0] < LOG_RATE_LIMIT_INTERVAL:
+                limit[1] += 1
+                return
+            suppressed = limit[1]
+            limit[0] = created
+            limit[1] = 0
+        else:
+            if len(log_rate_limits) >= LOG_RATE_LIMIT_MAX_KEYS:
+                log_rate_limits.clear()
+            log_rate_limits[key] = [created, 0]
+
+    if args:
+        args = tuple(arg if is_immutable_arg(arg) else str(arg) for arg in args)
+    entry = (created, level, message, args, suppressed)
+    debug_log.append(entry)
+
+    sink_queue = log_sink_queue
+    if sink_queue is not None:
+        try:
+            sink_queue.put_nowait(entry)
+        except queue.Full:
+            log_sink_stats["dropped"] += 1
+
+def is_immutable_arg(arg):
+    """Check whether a log arg can be kept unformatted until the entry is read"""
+    if isinstance(arg, tuple):
+        return all(is_immutable_arg(item) for item in arg)
+    return isinstance(arg, (str, int, float))
+
+def format_log_message(message, args, suppressed=0):
+    """Format deferred log message"""
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args}"
+    if suppressed:
+        message = f"{message} ({suppressed} similar messages suppressed)"
+    return message
+
+def format_log_entry(entry):
+    """Format raw debug log entry for display"""
+    created, level, message, args, suppressed = entry
+    return {
+        "timestamp": datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S"),
         "level": level,
-        "message": message
-    })
-    
-    # Limit log size
-    if len(debug_log) > MAX_DEBUG_ENTRIES:
-        debug_log = debug_log[-MAX_DEBUG_ENTRIES:]
+        "message": format_log_message(message, args, suppressed)
+    }
 
-def add_trigger_event(connection_id, path, trigger_type, value, threshold, action):
-    """Add trigger event to history"""
-    global trigger_history
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    trigger_history.append({
-        "timestamp": timestamp,
+def get_debug_log_entries():
+    """Get formatted debug log entries, newest first"""
+    return [format_log_entry(entry) for entry in reversed(list(debug_log))]
+
+def log_sink_worker(sink_queue):
+    """Background worker writing log entries as JSON lines to a rotating file"""
+    handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    try:
+        while True:
+            entry = sink_queue.get()
+            if entry is None:
+                break
+            created, level, message, args, suppressed = entry
+            line = json.dumps({
+                "timestamp": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+                "level": level,
+                "message": format_log_message(message, args, suppressed)
+            })
+            handler.emit(logging.makeLogRecord({"msg": line, "levelno": LOG_LEVELS.get(level, logging.INFO)}))
+            log_sink_stats["written"] += 1
+    finally:
+        handler.close()
+
+def start_log_sink():
+    """Start background file sink for the debug log"""
+    global log_sink_queue, log_sink_thread
+    with log_sink_lock:
+        if log_sink_queue is None:
+            sink_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            log_sink_thread = threading.Thread(target=log_sink_worker, args=(sink_queue,), daemon=True)
+            log_sink_thread.start()
+            log_sink_queue = sink_queue
+
+def stop_log_sink():
+    """Stop background file sink, writing out queued entries"""
+    global log_sink_queue, log_sink_thread
+    with log_sink_lock:
+        sink_queue = log_sink_queue
+        if sink_queue is not None:
+            log_sink_queue = None
+            sink_queue.put(None)
+            # Only one thread may own the rotating log file at a time
+            log_sink_thread.join()
+            log_sink_thread = None
+
+def configure_logging(settings):
+    """Apply log level and file sink settings"""
+    global log_level_threshold
+    log_level_threshold = LOG_LEVELS.get(str(settings.get("log_level", "INFO")).upper(), logging.INFO)
+    enabled = bool(settings.get("log_file_enabled", False))
+    if enabled != (log_sink_queue is not None):
+        if enabled:
+            start_log_sink()
+        else:
+            stop_log_sink()
+
+def build_event(connection_id, path, trigger_type, value, threshold, action):
+    """Build trigger event entry"""
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "connection_id": connection_id,
         "path": path,
         "trigger_type": trigger_type,
         "value": value,
         "threshold": threshold,
         "action": action
-    })
+    }
+
+def subscribe_events(callback):
+    """Register callback for published events"""
+    if callback not in event_subscribers:
+        event_subscribers.append(callback)
+
+def publish_event(event):
+    """Publish event to all subscribers without blocking the caller"""
+    for callback in event_subscribers:
+        try:
+            callback(event)
+        except Exception:
+            # Subscribers must never break monitoring
+            pass
+
+def add_trigger_event(connection_id, path, trigger_type, value, threshold, action):
+    """Add trigger event to history"""
+    global trigger_history
+    event = build_event(connection_id, path, trigger_type, value, threshold, action)
+    trigger_history.append(event)
     
     # Limit trigger history size
     if len(trigger_history) > MAX_TRIGGER_ENTRIES:
         trigger_history = trigger_history[-MAX_TRIGGER_ENTRIES:]
+    
+    publish_event(event)
 
 def load_settings():
     """Load settings from file"""
@@ -56,7 +204,7 @@ def load_settings():
                 settings.update(loaded_settings)
                 return settings
         except Exception as e:
-            add_debug_log(f"Error loading settings: {e}", "ERROR")
+            add_debug_log("Error loading settings: %s", "ERROR", e, key="load_settings_error")
     return DEFAULT_SETTINGS.copy()
 
 def save_settings(settings):
@@ -66,7 +214,7 @@ def save_settings(settings):
             json.dump(settings, f, indent=2)
         return True
     except Exception as e:
-        add_debug_log(f"Error saving settings: {e}", "ERROR")
+        add_debug_log("Error saving settings: %s", "ERROR", e, key="save_settings_error")
         return False
 
 def clear_debug_log():